@@ -1,7 +1,13 @@
 import argparse
+import asyncio
+import os
 import pokeretriever.RequestHandlers as Handlers
 import pokeretriever.Enums as Enums
 import pokeretriever.Request as Request
+import pokeretriever.Fetcher as Fetcher
+import pokeretriever.Cache as Cache
+import pokeretriever.Scheduler as Scheduler
+import pokeretriever.AccessLog as AccessLog
 
 
 class Pokedex:
@@ -22,27 +28,82 @@ class Pokedex:
         :param r: request
         :return:
         """
+        self.build_chain(r, self.start_handler)
+        self.start_handler.handle_request(r)
+
+    def execute_requests(self, requests):
+        """
+        Executes several requests concurrently, e.g. interactive lookups
+        alongside a crawl. Requests that share a fetcher also share its
+        cache and scheduler
+        :param requests: list of requests
+        :return:
+        """
+        start_handlers = []
+        for r in requests:
+            input_handler = Handlers.InputHandler()
+            self.build_chain(r, input_handler)
+            start_handlers.append(input_handler)
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(asyncio.gather(
+            *[handler.handle_request_async(r) for handler, r in zip(start_handlers, requests)]))
+        fetchers = {id(r.fetcher): r.fetcher for r in requests}
+        loop.run_until_complete(asyncio.gather(*[fetcher.drain() for fetcher in fetchers.values()]))
+
+    @staticmethod
+    def build_chain(r: Request, start_handler):
+        """
+        Builds the handler chain after the start handler depending on the selected mode
+        :param r: request
+        :param start_handler: InputHandler the chain starts at
+        :return:
+        """
         pokemon_handler = Handlers.PokemonRequestHandler()
         move_handler = Handlers.MoveRequestHandler()
         ability_handler = Handlers.AbilityRequestHandler()
+        stat_handler = Handlers.StatRequestHandler()
+        evolution_handler = Handlers.EvolutionRequestHandler()
+        crawl_handler = Handlers.CrawlHandler()
+        fuzzy_handler = Handlers.FuzzyMatchHandler()
+        sprite_handler = Handlers.SpriteRequestHandler()
         expanded_handler = Handlers.PokemonExpandedHandler()
+        learnset_handler = Handlers.LearnsetHandler()
         output_handler = Handlers.OutputHandler()
 
-        if r.mode == Enums.PokedexMode.POKEMON:
+        if r.learns is not None or r.version_group is not None:
+            # Learnset queries are answered just before the pokemon are output
+            learnset_handler.set_handler(output_handler)
+            output_handler = learnset_handler
+
+        if r.crawl:
+            crawl_handler.set_handler(output_handler)
+            start_handler.set_handler(crawl_handler)
+        elif r.mode == Enums.PokedexMode.POKEMON:
             if r.expanded:
                 expanded_handler.set_handler(output_handler)
-                self.start_handler.set_handler(expanded_handler)
+                start_handler.set_handler(expanded_handler)
             else:
                 pokemon_handler.set_handler(output_handler)
-                self.start_handler.set_handler(pokemon_handler)
+                start_handler.set_handler(pokemon_handler)
         elif r.mode == Enums.PokedexMode.ABILITY:
             ability_handler.set_handler(output_handler)
-            self.start_handler.set_handler(ability_handler)
+            start_handler.set_handler(ability_handler)
         elif r.mode == Enums.PokedexMode.MOVE:
             move_handler.set_handler(output_handler)
-            self.start_handler.set_handler(move_handler)
+            start_handler.set_handler(move_handler)
+        elif r.mode == Enums.PokedexMode.STAT:
+            stat_handler.set_handler(output_handler)
+            start_handler.set_handler(stat_handler)
+        elif r.mode == Enums.PokedexMode.EVOLUTION:
+            evolution_handler.set_handler(output_handler)
+            start_handler.set_handler(evolution_handler)
+        elif r.mode == Enums.PokedexMode.SPRITE:
+            sprite_handler.set_handler(output_handler)
+            start_handler.set_handler(sprite_handler)
 
-        self.start_handler.handle_request(r)
+        if r.fuzzy and not r.crawl:
+            fuzzy_handler.set_handler(start_handler.next_handler)
+            start_handler.set_handler(fuzzy_handler)
 
 
 def setup_request_commandline() -> Request:
@@ -68,9 +129,68 @@ def setup_request_commandline() -> Request:
                         help="The way the output will be formatted"
                              "By default will print to console"
                              "Can provide a .txt file to be printed to")
+    parser.add_argument("--crawl", default=False, action='store_true',
+                        help="Optional flag. Fetches every record of the selected mode "
+                             "from the PokeAPI instead of reading an input")
+    parser.add_argument("--concurrency", default=20, type=int,
+                        help="Maximum number of requests in flight while crawling, or "
+                             "downloads in flight in sprite mode"
+                             "Default set to 20")
+    parser.add_argument("--spritedir", default="sprites",
+                        help="Directory that sprite mode downloads sprites into"
+                             "Default set to sprites")
+    parser.add_argument("--spritemirror", default=None,
+                        help="Optional base url that sprites are downloaded from instead "
+                             "of the PokeAPI sprites repository, e.g. a local server")
+    parser.add_argument("--cache", default=None,
+                        help="Optional directory that PokeAPI responses are cached in")
+    parser.add_argument("--maxage", default=86400, type=int,
+                        help="Seconds a cached response is fresh for. Stale responses are "
+                             "served immediately and refreshed in the background"
+                             "Default set to 86400")
+    parser.add_argument("--hedge", default=None, type=float,
+                        help="Optional latency percentile, e.g. 95. Requests slower than "
+                             "this percentile are sent a second time and the first "
+                             "response is used")
+    parser.add_argument("--fuzzy", default=False, action='store_true',
+                        help="Optional flag. Misspelt names are matched locally against "
+                             "the known names before anything is requested. Requires --cache")
+    parser.add_argument("--autocorrect", default=0.6, type=float,
+                        help="Similarity between 0 and 1 above which a misspelt name is "
+                             "replaced by its best match. Only used with --fuzzy"
+                             "Default set to 0.6")
+    parser.add_argument("--inflight", default=50, type=int,
+                        help="Maximum number of PokeAPI requests in flight across every "
+                             "request. Part of it is kept free for single key lookups"
+                             "Default set to 50")
+    parser.add_argument("--lookup", default=None,
+                        help="Optional name or id looked up and printed to console while "
+                             "the crawl runs, sharing its scheduler. Requires --crawl")
+    parser.add_argument("--warm", default=None, type=int,
+                        help="Optional number of keys. Fetches the most looked up keys of "
+                             "the mode into the cache instead of reading an input. Pokemon "
+                             "are warmed expanded. Requires --cache")
+    parser.add_argument("--prefetch", default=False, action='store_true',
+                        help="Optional flag. Fetches the abilities, moves and stats of "
+                             "looked up pokemon into the cache in the background")
+    parser.add_argument("--learns", default=None,
+                        help="Optional move name. Only the pokemon that learn the move are "
+                             "output, e.g. with --crawl every pokemon that learns it. "
+                             "Pokemon mode only")
+    parser.add_argument("--versiongroup", default=None,
+                        help="Optional version group name, e.g. red-blue. Outputs the moves "
+                             "each pokemon learns in it, or narrows --learns to it. "
+                             "Pokemon mode only")
+    parser.add_argument("--maxlevel", default=None, type=int,
+                        help="Optional. Only moves learned at or below this level are "
+                             "output. Requires --versiongroup")
+    parser.add_argument("--learnmethod", default=None,
+                        help="Optional learn method, e.g. level-up. Only moves learned this "
+                             "way are output. Requires --versiongroup")
 
     parser.add_argument("mode", help="Specify the mode that the pokedex will be opened in"
-                                     "This must be 'pokemon', 'ability' or 'move'")
+                                     "This must be 'pokemon', 'ability', 'move', 'stat', "
+                                     "'evolution' or 'sprite'")
 
 #try:
     args = parser.parse_args()
@@ -80,10 +200,53 @@ def setup_request_commandline() -> Request:
     r.input_data = args.inputdata
     r.expanded = args.expanded
     r.output = args.output
+    r.crawl = args.crawl
+    r.concurrency = args.concurrency
+    r.sprite_dir = args.spritedir
+    r.sprite_mirror = args.spritemirror
+    r.warm = args.warm
+    r.prefetch = args.prefetch
+    if r.warm and r.mode == Enums.PokedexMode.POKEMON:
+        r.expanded = True
+    r.fuzzy = args.fuzzy
+    r.autocorrect = args.autocorrect
+    r.learns = args.learns
+    r.version_group = args.versiongroup
+    r.max_level = args.maxlevel
+    r.learn_method = args.learnmethod
+    if args.fuzzy and not args.cache:
+        parser.error("--fuzzy requires --cache")
+    if args.warm and not args.cache:
+        parser.error("--warm requires --cache")
+    if args.prefetch and not args.cache:
+        parser.error("--prefetch requires --cache")
+    if args.lookup and not args.crawl:
+        parser.error("--lookup requires --crawl")
+    if (args.learns or args.versiongroup) and r.mode != Enums.PokedexMode.POKEMON:
+        parser.error("--learns and --versiongroup require pokemon mode")
+    if (args.maxlevel is not None or args.learnmethod) and not args.versiongroup:
+        parser.error("--maxlevel and --learnmethod require --versiongroup")
+    cache = Cache.PokedexCache(args.cache) if args.cache else None
+    if cache is not None:
+        r.access_log = AccessLog.AccessLog(os.path.join(args.cache, "access_log.json"))
+    scheduler = Scheduler.RequestScheduler(args.inflight)
+    r.fetcher = Fetcher.Fetcher(cache, args.maxage, args.hedge, scheduler=scheduler)
     print(r)
 
     pokedex = Pokedex()
-    pokedex.execute_request(r)
+    if args.lookup:
+        lookup = Request.Request()
+        lookup.mode = r.mode
+        lookup.input_data = args.lookup
+        lookup.fuzzy = r.fuzzy
+        lookup.sprite_dir = r.sprite_dir
+        lookup.sprite_mirror = r.sprite_mirror
+        lookup.autocorrect = r.autocorrect
+        lookup.access_log = r.access_log
+        lookup.fetcher = r.fetcher
+        pokedex.execute_requests([r, lookup])
+    else:
+        pokedex.execute_request(r)
     return r
 # except Exception as e:
 #     print(f"Error! Could not read arguments.\n{type(e)}")
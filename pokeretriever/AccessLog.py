@@ -0,0 +1,53 @@
+import collections
+import json
+import os
+"""
+This module contains the access log that counts how often each key is looked up
+"""
+
+
+class AccessLog:
+    """
+    Counts lookups of each key per pokedex mode, saved as a json file
+    """
+
+    def __init__(self, path):
+        """
+        Constructor. Loads the counts saved at the path, if any
+        :param path: path of the json file
+        """
+        self._path = path
+        self._counts = collections.defaultdict(collections.Counter)
+        try:
+            with open(path, mode='r') as f:
+                for mode, counts in json.load(f).items():
+                    self._counts[mode].update(counts)
+        except (OSError, ValueError):
+            pass
+
+    def record(self, mode, keys):
+        """
+        Counts a lookup of each key
+        :param mode: PokedexMode the keys were looked up in
+        :param keys: iterable of keys, as they were requested
+        :return:
+        """
+        self._counts[mode.value].update(keys)
+
+    def hottest(self, mode, number) -> list:
+        """
+        Gets the most looked up keys of a mode
+        :param mode: PokedexMode
+        :param number: maximum number of keys
+        :return: list of keys, most looked up first
+        """
+        return [key for key, count in self._counts[mode.value].most_common(number)]
+
+    def save(self):
+        """
+        Writes the counts to the json file
+        :return:
+        """
+        with open(f"{self._path}.tmp", mode='w') as f:
+            json.dump(self._counts, f)
+        os.replace(f"{self._path}.tmp", self._path)
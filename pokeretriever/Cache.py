@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import time
+"""
+This module contains the on-disk cache of PokeAPI responses
+"""
+
+
+class PokedexCache:
+    """
+    Stores PokeAPI responses as json files in a directory, one file per url.
+    Nothing is kept in memory, so a crawl does not hold every response at once
+    """
+
+    def __init__(self, directory):
+        """
+        Constructor
+        :param directory: path of the cache directory, created if missing
+        """
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def directory(self):
+        """
+        Path of the cache directory
+        :return: string
+        """
+        return self._directory
+
+    def _path(self, url):
+        """
+        Gets the file path that a url is cached at
+        :param url: string
+        :return: string
+        """
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self._directory, f"{digest}.json")
+
+    def get(self, url):
+        """
+        Gets a cached response
+        :param url: the full url of the request
+        :return: (data, age in seconds) tuple, or None if the url is not cached
+        """
+        try:
+            with open(self._path(url), mode='r') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return record['data'], time.time() - record['timestamp']
+
+    def __contains__(self, url):
+        """
+        True if the url is cached. Does not read the cached response
+        :param url: the full url of the request
+        :return: bool
+        """
+        return os.path.exists(self._path(url))
+
+    def put(self, url, data):
+        """
+        Caches a response. The file is written to a temporary name first so
+        that an interrupted write never leaves a corrupt record behind
+        :param url: the full url of the request
+        :param data: json dictionary
+        :return:
+        """
+        record = {'timestamp': time.time(), 'data': data}
+        path = self._path(url)
+        with open(f"{path}.tmp", mode='w') as f:
+            json.dump(record, f)
+        os.replace(f"{path}.tmp", path)
@@ -8,3 +8,14 @@ class PokedexMode(enum.Enum):
     POKEMON = "pokemon"
     ABILITY = "ability"
     MOVE = "move"
+    STAT = "stat"
+    EVOLUTION = "evolution"
+    SPRITE = "sprite"
+
+
+class RequestPriority(enum.IntEnum):
+    """
+    Enum for the priorities PokeAPI requests are scheduled with. Lower runs first
+    """
+    INTERACTIVE = 0
+    BULK = 1
@@ -0,0 +1,240 @@
+import asyncio
+import collections
+import time
+import aiohttp
+import pokeretriever.Enums as Enums
+"""
+This module contains the fetcher that every handler requests PokeAPI data through.
+It serves cached records while refreshing stale ones in the background, hedges
+slow requests and stops calling the PokeAPI while it is failing
+"""
+
+
+async def get_pokedex_data(key, url, session) -> dict:
+    """
+    Gets the pokedex data from the PokeAPI
+    :param key: input data/request
+    :param url: reference url of the API
+    :param session:
+    :return:
+    """
+    try:
+        target_url = url.format(key)
+        response = await session.request(method="GET", url=target_url)
+        if response.status >= 500:
+            response.raise_for_status()
+        json_dict = await response.json()
+        return json_dict
+    except aiohttp.ContentTypeError:
+        return {'error': "error"}
+
+
+class Fetcher:
+    """
+    Fetches pokedex data with an optional cache in front of the PokeAPI
+    """
+
+    def __init__(self, cache=None, max_age=86400, hedge_percentile=None,
+                 failure_threshold=5, cooldown=30, scheduler=None):
+        """
+        Constructor
+        :param cache: Optional PokedexCache. Without one every request goes to the PokeAPI
+        :param max_age: seconds a cached record is fresh for. Older records are
+        still served, but are refreshed in the background
+        :param hedge_percentile: Optional. A duplicate request is sent when a
+        request takes longer than this percentile of recent latencies
+        :param failure_threshold: consecutive failures that open the circuit
+        :param cooldown: seconds the circuit stays open before the PokeAPI is tried again
+        :param scheduler: Optional RequestScheduler that every PokeAPI request waits on
+        """
+        self._cache = cache
+        self._scheduler = scheduler
+        self._max_age = max_age
+        self._hedge_percentile = hedge_percentile
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown
+        self._latencies = collections.deque(maxlen=200)
+        self._failures = 0
+        self._open_until = 0
+        self._refreshing = {}
+        self._refresh_session = None
+
+    # Hedging waits for this many latency samples before it kicks in
+    MIN_HEDGE_SAMPLES = 20
+
+    @property
+    def cache(self):
+        """
+        Cache in front of the PokeAPI
+        :return: PokedexCache or None
+        """
+        return self._cache
+
+    @property
+    def circuit_open(self):
+        """
+        True while the PokeAPI is considered to be failing
+        :return: bool
+        """
+        return time.monotonic() < self._open_until
+
+    async def fetch(self, key, url, session, priority=Enums.RequestPriority.INTERACTIVE,
+                    owner=None) -> dict:
+        """
+        Gets the pokedex data for a key. Fresh cached records are returned
+        straight away. Stale ones are returned too, and a refresh is started
+        in the background. While the circuit is open only the cache is used
+        :param key: input data/request
+        :param url: reference url of the API
+        :param session:
+        :param priority: RequestPriority the PokeAPI request is scheduled with
+        :param owner: the pokedex request the PokeAPI request belongs to
+        :return:
+        """
+        target_url = url.format(key)
+        cached = self._cache.get(target_url) if self._cache is not None else None
+        if cached is not None:
+            data, age = cached
+            if age > self._max_age and not self.circuit_open:
+                self._start_background(key, url)
+            return data
+        if self.circuit_open:
+            return {'error': "error"}
+        if self._scheduler is None:
+            return await self._fetch_upstream(key, url, session)
+        # A hedged duplicate shares the slot of the request it duplicates
+        async with self._scheduler.slot(priority, owner):
+            return await self._fetch_upstream(key, url, session)
+
+    async def _fetch_upstream(self, key, url, session) -> dict:
+        """
+        Requests the key from the PokeAPI, hedging it if it is slow, and
+        caches the response
+        :param key: input data/request
+        :param url: reference url of the API
+        :param session:
+        :return:
+        """
+        if self.circuit_open:
+            return {'error': "error"}
+        try:
+            data = await self._hedged_request(key, url, session)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self._record_failure()
+            return {'error': "error"}
+        self._failures = 0
+        if self._cache is not None and 'error' not in data:
+            self._cache.put(url.format(key), data)
+        return data
+
+    async def _hedged_request(self, key, url, session) -> dict:
+        """
+        Sends the request, and a duplicate of it if the first one is still
+        running after the hedge delay. Whichever succeeds first is used. A
+        request that fails is never hedged, so a failing PokeAPI is not sent
+        any extra requests. Only the latency of the first request is recorded
+        :param key: input data/request
+        :param url: reference url of the API
+        :param session:
+        :return:
+        """
+        start = time.monotonic()
+        original = asyncio.ensure_future(get_pokedex_data(key, url, session))
+
+        def record_latency(task):
+            # A first request cancelled because its hedge won took at least this long
+            if task.cancelled() or task.exception() is None:
+                self._latencies.append(time.monotonic() - start)
+
+        original.add_done_callback(record_latency)
+        tasks = {original}
+        try:
+            done, tasks = await asyncio.wait(tasks, timeout=self._hedge_delay())
+            if done:
+                return original.result()
+            tasks.add(asyncio.ensure_future(get_pokedex_data(key, url, session)))
+            while True:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not tasks:
+                    raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _hedge_delay(self):
+        """
+        Gets how long to wait before sending a hedged request
+        :return: seconds, or None if hedging is off or there are too few samples
+        """
+        if self._hedge_percentile is None or len(self._latencies) < self.MIN_HEDGE_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        index = int(self._hedge_percentile / 100 * (len(latencies) - 1))
+        return latencies[index]
+
+    def _record_failure(self):
+        """
+        Counts a failed request and opens the circuit once there are too many in a row
+        :return:
+        """
+        self._failures += 1
+        if self._failures >= self._failure_threshold:
+            self._open_until = time.monotonic() + self._cooldown
+            self._failures = 0
+
+    def prefetch(self, key, url):
+        """
+        Fetches a record into the cache in the background, unless it is
+        cached already. Does nothing without a cache
+        :param key: input data/request
+        :param url: reference url of the API
+        :return:
+        """
+        if self._cache is None or self.circuit_open or url.format(key) in self._cache:
+            return
+        self._start_background(key, url)
+
+    def _start_background(self, key, url):
+        """
+        Fetches a record in the background to refresh or prefetch it. These
+        fetches use their own session so they can outlive the handler that
+        started them
+        :param key: input data/request
+        :param url: reference url of the API
+        :return:
+        """
+        target_url = url.format(key)
+        if target_url in self._refreshing:
+            return
+        if self._refresh_session is None:
+            self._refresh_session = aiohttp.ClientSession()
+        task = asyncio.ensure_future(self._refresh(key, url))
+        self._refreshing[target_url] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(target_url, None))
+
+    async def _refresh(self, key, url):
+        """
+        Requests a record in the background, as bulk work so it never delays a lookup
+        :param key: input data/request
+        :param url: reference url of the API
+        :return:
+        """
+        if self._scheduler is None:
+            return await self._fetch_upstream(key, url, self._refresh_session)
+        async with self._scheduler.slot(Enums.RequestPriority.BULK, self):
+            return await self._fetch_upstream(key, url, self._refresh_session)
+
+    async def drain(self):
+        """
+        Waits for the background fetches to finish and closes their session
+        :return:
+        """
+        if self._refreshing:
+            await asyncio.gather(*self._refreshing.values(), return_exceptions=True)
+        if self._refresh_session is not None:
+            await self._refresh_session.close()
+            self._refresh_session = None
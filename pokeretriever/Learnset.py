@@ -0,0 +1,172 @@
+import array
+import sys
+"""
+This module contains the compact move learnset index that is built from the moves of a /pokemon response
+"""
+
+
+class LearnsetIndex:
+    """
+    Compact index of pokemon x move x version group -> learn method and level.
+    Every name is interned into an integer id once, and each learnset entry is
+    stored as one row across parallel arrays instead of nested dictionaries
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._ids = {}
+        self._names = []
+        self._pokemon = array.array('I')
+        self._move = array.array('I')
+        self._version_group = array.array('I')
+        self._method = array.array('I')
+        self._level = array.array('B')
+        # Rows of one pokemon are always added together, so a range is enough
+        self._pokemon_rows = {}
+        self._move_rows = {}
+
+    def _intern(self, name) -> int:
+        """
+        Gets the id of a name, adding it to the name table if it is new
+        :param name: string
+        :return: int
+        """
+        name_id = self._ids.get(name)
+        if name_id is None:
+            name_id = len(self._names)
+            self._ids[name] = name_id
+            self._names.append(sys.intern(name))
+        return name_id
+
+    def _add_row(self, pokemon_id, move_id, version_group_id, method_id, level):
+        """
+        Appends a single learnset row
+        """
+        row = len(self._level)
+        self._pokemon.append(pokemon_id)
+        self._move.append(move_id)
+        self._version_group.append(version_group_id)
+        self._method.append(method_id)
+        self._level.append(level)
+        self._move_rows.setdefault(move_id, array.array('I')).append(row)
+
+    def add(self, pokemon, moves):
+        """
+        Parses the moves list of a /pokemon response into the index.
+        Pokemon that are already in the index are skipped
+        :param pokemon: name of the pokemon
+        :param moves: the 'moves' list of the /pokemon response
+        :return:
+        """
+        pokemon_id = self._intern(pokemon)
+        if pokemon_id in self._pokemon_rows:
+            return
+        start = len(self._level)
+        for move in moves:
+            move_id = self._intern(move['move']['name'])
+            for details in move['version_group_details']:
+                self._add_row(pokemon_id, move_id,
+                              self._intern(details['version_group']['name']),
+                              self._intern(details['move_learn_method']['name']),
+                              details['level_learned_at'])
+        self._pokemon_rows[pokemon_id] = (start, len(self._level))
+
+    def _rows_of(self, pokemon):
+        """
+        Gets the rows of a pokemon
+        :param pokemon: name of the pokemon
+        :return: range of row numbers, empty if the pokemon is not indexed
+        """
+        start, end = self._pokemon_rows.get(self._ids.get(pokemon), (0, 0))
+        return range(start, end)
+
+    def move_names(self, pokemon) -> list:
+        """
+        Gets the names of every move a pokemon can learn, in response order
+        :param pokemon: name of the pokemon
+        :return: list of move names
+        """
+        seen = set()
+        names = []
+        for row in self._rows_of(pokemon):
+            move_id = self._move[row]
+            if move_id not in seen:
+                seen.add(move_id)
+                names.append(self._names[move_id])
+        return names
+
+    def first_levels(self, pokemon) -> list:
+        """
+        Gets each move of a pokemon with the level of its first version group entry
+        :param pokemon: name of the pokemon
+        :return: list of (move name, level) tuples
+        """
+        seen = set()
+        levels = []
+        for row in self._rows_of(pokemon):
+            move_id = self._move[row]
+            if move_id not in seen:
+                seen.add(move_id)
+                levels.append((self._names[move_id], self._level[row]))
+        return levels
+
+    def moves_learned(self, pokemon, version_group, max_level=None, method=None) -> list:
+        """
+        Gets the moves a pokemon learns in a version group, e.g. the moves
+        pikachu learns by level 30 in red-blue is
+        moves_learned('pikachu', 'red-blue', 30, 'level-up')
+        :param pokemon: name of the pokemon
+        :param version_group: name of the version group
+        :param max_level: Optional. Only moves learned at or below this level
+        :param method: Optional. Only moves learned with this learn method
+        :return: list of (move name, learn method, level) tuples
+        """
+        version_group_id = self._ids.get(version_group)
+        method_id = self._ids.get(method) if method is not None else None
+        if version_group_id is None or (method is not None and method_id is None):
+            return []
+        learned = []
+        for row in self._rows_of(pokemon):
+            if self._version_group[row] != version_group_id:
+                continue
+            if method_id is not None and self._method[row] != method_id:
+                continue
+            if max_level is not None and self._level[row] > max_level:
+                continue
+            learned.append((self._names[self._move[row]],
+                            self._names[self._method[row]],
+                            self._level[row]))
+        return learned
+
+    def pokemon_learning(self, move, version_group=None) -> list:
+        """
+        Gets the pokemon in the index that can learn a move
+        :param move: name of the move
+        :param version_group: Optional. Only pokemon that learn it in this version group
+        :return: list of pokemon names
+        """
+        rows = self._move_rows.get(self._ids.get(move), ())
+        version_group_id = None
+        if version_group is not None:
+            version_group_id = self._ids.get(version_group)
+            if version_group_id is None:
+                return []
+        seen = set()
+        names = []
+        for row in rows:
+            if version_group_id is not None and self._version_group[row] != version_group_id:
+                continue
+            pokemon_id = self._pokemon[row]
+            if pokemon_id not in seen:
+                seen.add(pokemon_id)
+                names.append(self._names[pokemon_id])
+        return names
+
+    def __len__(self):
+        """
+        Number of learnset rows in the index
+        :return: int
+        """
+        return len(self._level)
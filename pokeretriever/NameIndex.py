@@ -0,0 +1,78 @@
+import collections
+"""
+This module contains the trigram index used to match misspelt names locally
+"""
+
+
+def trigrams(name) -> set:
+    """
+    Gets the trigrams of a name. The name is padded so that its start and end
+    count as much as its middle
+    :param name: string
+    :return: set of 3 character strings
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def normalize(name) -> str:
+    """
+    Gets a name in the form the PokeAPI uses
+    :param name: string
+    :return: lower case string with spaces replaced by dashes
+    """
+    return "-".join(name.strip().lower().split())
+
+
+class TrigramIndex:
+    """
+    Index of known names by their trigrams
+    """
+
+    def __init__(self, names):
+        """
+        Constructor
+        :param names: iterable of names
+        """
+        self._names = []
+        self._sizes = []
+        self._postings = collections.defaultdict(list)
+        for name in dict.fromkeys(names):
+            name_grams = trigrams(name)
+            name_id = len(self._names)
+            self._names.append(name)
+            self._sizes.append(len(name_grams))
+            for gram in name_grams:
+                self._postings[gram].append(name_id)
+        self._known = set(self._names)
+
+    def __contains__(self, name):
+        """
+        True if the name is in the index
+        :param name: string
+        :return: bool
+        """
+        return name in self._known
+
+    def __len__(self):
+        """
+        Number of names in the index
+        :return: int
+        """
+        return len(self._names)
+
+    def suggest(self, name, limit=3) -> list:
+        """
+        Gets the closest known names, ranked by the Dice similarity of their trigrams
+        :param name: string
+        :param limit: maximum number of suggestions
+        :return: list of (name, score) tuples, best first. Scores are between 0 and 1
+        """
+        name_grams = trigrams(name)
+        shared = collections.Counter()
+        for gram in name_grams:
+            shared.update(self._postings.get(gram, ()))
+        scored = [(2 * count / (len(name_grams) + self._sizes[name_id]), self._names[name_id])
+                  for name_id, count in shared.items()]
+        scored.sort(key=lambda score_name: (-score_name[0], score_name[1]))
+        return [(match, score) for score, match in scored[:limit]]
@@ -1,4 +1,6 @@
 import abc
+import collections
+import pokeretriever.Learnset as Learnset
 """
 This module contains the abstract and concrete classes for all objects that the Pokedex creates
 """
@@ -39,7 +41,8 @@ class Pokemon(PokedexObject):
     """
     Pokemon Object that is created from the PokeAPI
     """
-    def __init__(self, height, weight, stats, types, abilities, moves, **kwargs):
+    def __init__(self, height, weight, stats, types, abilities, moves, sprites=None,
+                 learnset=None, **kwargs):
         """
         Constructor
         :param height: int
@@ -48,15 +51,23 @@ class Pokemon(PokedexObject):
         :param types: String list
         :param abilities: PokemonAbility list
         :param moves: PokemonMove list
+        :param sprites: nested dictionary of sprite urls
+        :param learnset: Optional LearnsetIndex shared by the pokemon of a
+        request that the moves are added to. A new one is made if not given
         :param kwargs: name and poke_id
         """
         super().__init__(**kwargs)
+        self._sprites = sprites if sprites is not None else {}
         self._height = height
         self._weight = weight
         self._stats = stats
         self._types = types
         self._abilities = abilities
-        self._moves = moves
+        # The raw moves list is the bulk of the response, so it is only kept
+        # as a compact learnset index
+        self._learnset = learnset if learnset is not None else Learnset.LearnsetIndex()
+        self._learnset.add(self.name, moves)
+        self._moves = None
         self._expanded = False
 
     @property
@@ -177,9 +188,7 @@ class Pokemon(PokedexObject):
         move_list = []
         if self._expanded:
             return self._moves
-        for move in self._moves:
-            name = move['move']['name']
-            level_acquired = str(move['version_group_details'][0]['level_learned_at'])
+        for name, level_acquired in self._learnset.first_levels(self.name):
             string_move = f"Move name: {name}, Level acquired: {level_acquired}"
             move_list.append(string_move)
         return "\n".join(move_list)
@@ -190,10 +199,7 @@ class Pokemon(PokedexObject):
         Helper method for creating PokeMove objects
         :return:
         """
-        move_list = []
-        for move in self._moves:
-            move_list.append(move['move']['name'])
-        return move_list
+        return self._learnset.move_names(self.name)
 
     @moves.setter
     def moves(self, value):
@@ -206,6 +212,43 @@ class Pokemon(PokedexObject):
         self._expanded = True
         self._moves = value
 
+    @property
+    def sprite_urls(self):
+        """
+        Urls of every sprite of the pokemon
+        :return: dictionary of sprite urls by their path in the sprites
+        dictionary, e.g. 'other/official-artwork/front_default'
+        """
+        sprite_urls = {}
+        sprites = [("", self._sprites)]
+        while sprites:
+            prefix, sprite_dict = sprites.pop()
+            for key, value in sprite_dict.items():
+                if isinstance(value, dict):
+                    sprites.append((f"{prefix}{key}/", value))
+                elif isinstance(value, str):
+                    sprite_urls[f"{prefix}{key}"] = value
+        return sprite_urls
+
+    @property
+    def learnset(self):
+        """
+        Index of the moves the pokemon learns in each version group. Holds
+        every other pokemon it was shared with too
+        :return: LearnsetIndex
+        """
+        return self._learnset
+
+    def moves_learned(self, version_group, max_level=None, method=None):
+        """
+        Gets the moves the pokemon learns in a version group
+        :param version_group: name of the version group
+        :param max_level: Optional. Only moves learned at or below this level
+        :param method: Optional. Only moves learned with this learn method
+        :return: list of (move name, learn method, level) tuples
+        """
+        return self._learnset.moves_learned(self.name, version_group, max_level, method)
+
     def __str__(self):
         """
         toString for Pokemon
@@ -480,3 +523,77 @@ class PokemonMove(PokedexObject):
                f"Type: {self.type}\n" \
                f"Damage Class: {self.damage_class}\n" \
                f"Effect (Short): {self.short_effect}\n\n"
+
+
+class EvolutionChain(PokedexObject):
+    """
+    Evolution family of a Pokemon, created from an evolution chain of the PokeAPI
+    """
+    def __init__(self, chain, **kwargs):
+        """
+        Constructor
+        :param chain: nested chain link dictionary starting at the base species
+        :param kwargs: poke_id of the chain. The name is the base species name
+        """
+        super().__init__(name=chain['species']['name'], **kwargs)
+        self._members = []
+        self._member_ids = []
+        # Walk the chain breadth first so members are listed stage by stage
+        links = collections.deque([(chain, 1, None)])
+        while links:
+            link, stage, evolves_from = links.popleft()
+            name = link['species']['name']
+            details = link['evolution_details'][0] if link['evolution_details'] else {}
+            self._members.append((name, stage, evolves_from, details))
+            self._member_ids.append(link['species']['url'].rstrip('/').split('/')[-1])
+            for evolution in link['evolves_to']:
+                links.append((evolution, stage + 1, name))
+
+    @property
+    def members(self):
+        """
+        Species names of every member of the family, stage by stage
+        :return: list of species names
+        """
+        return [member[0] for member in self._members]
+
+    @property
+    def member_ids(self):
+        """
+        Species ids of every member of the family, in the same order as members
+        :return: list of species ids as strings
+        """
+        return self._member_ids
+
+    @property
+    def family(self):
+        """
+        Formatted list of the family members and how they evolve
+        :return: string
+        """
+        list_family = []
+        for name, stage, evolves_from, details in self._members:
+            string_member = f"{name} (Stage {stage})"
+            if evolves_from is not None:
+                string_member += f", evolves from {evolves_from}"
+                trigger = details.get('trigger')
+                if trigger is not None:
+                    string_member += f" by {trigger['name']}"
+                if details.get('min_level') is not None:
+                    string_member += f" at level {details['min_level']}"
+            list_family.append(string_member)
+        return "\n".join(list_family)
+
+    def __str__(self):
+        """
+        Formatted string of the evolution chain containing the family
+        :return:
+        """
+        return f"Name: {self.name}\n" \
+               f"ID: {self.poke_id}\n" \
+               f"\nFamily:\n" \
+               f"------\n" \
+               f"{self.family}\n\n"
+
+    def __repr__(self):
+        return self.__str__()
@@ -11,16 +11,59 @@ class Request:
         output: Optional flag. If true, a filename must also be provided. Result will
         be printed into the provided file. If not, result will be printed to
         console
+        crawl: Optional flag. If true, every record of the selected mode is
+        fetched from the PokeAPI list endpoints instead of the input
+        concurrency: Maximum number of PokeAPI requests in flight while crawling
+        fetcher: Fetcher that PokeAPI data is requested through
+        fuzzy: Optional flag. If true, misspelt keys are matched locally before
+        being requested
+        autocorrect: Similarity above which a misspelt key is replaced by its best match
+        skipped: Error messages of keys skipped before fetching, by input position
+        corrections: Notes of keys corrected before fetching, by input position
+        priority: RequestPriority of the PokeAPI requests. Single key lookups are
+        interactive and everything else is bulk unless set
+        access_log: Optional AccessLog that the looked up keys are counted in
+        warm: Optional number of most looked up keys to fetch instead of the input
+        prefetch: Optional flag. If true, the abilities, moves and stats of
+        looked up pokemon are fetched into the cache in the background
+        sprite_dir: Directory that sprites are downloaded into in sprite mode
+        sprite_mirror: Optional base url that replaces the PokeAPI sprites repository
+        in sprite urls
+        learnset: LearnsetIndex shared by every pokemon of the request
+        learns: Optional move name. Only the pokemon that learn it are output
+        version_group: Optional version group name. Without learns, the moves each
+        pokemon learns in it are output
+        max_level: Optional. Only moves learned at or below this level are output
+        learn_method: Optional. Only moves learned with this learn method are output
         """
         self.mode = None
         self.input_file = None
         self.input_data = None
-        self.expanded = None
-        self.output = None
+        self.expanded = False
+        self.output = 'print'
         self.raw_data = None
         self.result = []
         self.number_of_requests = None
+        self.crawl = False
+        self.concurrency = 20
+        self.output_started = False
+        self.fetcher = None
+        self.fuzzy = False
+        self.skipped = {}
+        self.corrections = {}
+        self.autocorrect = 0.6
+        self.priority = None
+        self.access_log = None
+        self.warm = None
+        self.prefetch = False
+        self.sprite_dir = None
+        self.sprite_mirror = None
+        self.learnset = None
+        self.learns = None
+        self.version_group = None
+        self.max_level = None
+        self.learn_method = None
 
     def __str__(self):
         return f"Mode: {self.mode}, Input File: {self.input_file}, Input Data: {self.input_data}" \
-               f", Expanded: {self.expanded}, Output: {self.output}"
+               f", Expanded: {self.expanded}, Output: {self.output}, Crawl: {self.crawl}"
@@ -1,26 +1,153 @@
 import abc
+import collections
 import datetime
+import itertools
 import aiohttp
 import asyncio
 import pokeretriever.PokedexObject as Poke
+import pokeretriever.Enums as Enums
+import pokeretriever.Fetcher as Fetcher
+import pokeretriever.Learnset as Learnset
+import pokeretriever.NameIndex as NameIndex
+import pokeretriever.SpriteStore as SpriteStore
 from pokedex import Request
 
+API_URL = "https://pokeapi.co/api/v2"
 
-async def get_pokedex_data(key, url, session) -> dict:
+SPRITE_URL = "https://raw.githubusercontent.com/PokeAPI/sprites/master/"
+
+CRAWL_PAGE_SIZE = 100
+
+# Number of pages whose detail records are fetched ahead of the page being written out
+CRAWL_PAGES_AHEAD = 2
+
+# Number of times a failed list page is requested again before its records are reported missing
+CRAWL_PAGE_RETRIES = 3
+
+# Maps each pokedex mode to its PokeAPI endpoint and the object built from it
+CRAWL_ENDPOINTS = {
+    Enums.PokedexMode.POKEMON: ("pokemon", Poke.Pokemon),
+    Enums.PokedexMode.ABILITY: ("ability", Poke.PokemonAbility),
+    Enums.PokedexMode.MOVE: ("move", Poke.PokemonMove),
+    Enums.PokedexMode.STAT: ("stat", Poke.PokemonStat),
+    Enums.PokedexMode.EVOLUTION: ("evolution-chain", Poke.EvolutionChain),
+    Enums.PokedexMode.SPRITE: ("pokemon", Poke.Pokemon),
+}
+
+# Maps each pokedex mode to the list endpoint holding the names it accepts
+NAME_ENDPOINTS = {
+    Enums.PokedexMode.POKEMON: "pokemon",
+    Enums.PokedexMode.ABILITY: "ability",
+    Enums.PokedexMode.MOVE: "move",
+    Enums.PokedexMode.STAT: "stat",
+    Enums.PokedexMode.EVOLUTION: "pokemon-species",
+    Enums.PokedexMode.SPRITE: "pokemon",
+}
+
+# A misspelt key is only corrected if its best match beats the next one by this much
+AUTOCORRECT_MARGIN = 0.2
+
+# Cache key of the evolution chain id a species name or id belongs to
+FAMILY_KEY = "evolution-family/{}"
+
+
+async def get_pokedex_data_limited(r: Request, key, url, session, semaphore) -> dict:
     """
-    Gets the pokedex data from the PokeAPI
+    Gets the pokedex data through the fetcher of the request, waiting on the
+    semaphore so that only a limited number of requests are in flight at once
+    :param r: request
     :param key: input data/request
     :param url: reference url of the API
     :param session:
+    :param semaphore: asyncio.Semaphore capping the concurrent requests
+    :return:
+    """
+    async with semaphore:
+        return await r.fetcher.fetch(key, url, session, r.priority, r)
+
+
+async def get_list_page(r: Request, offset, url, session, semaphore) -> dict:
+    """
+    Gets a list page of a crawl, requesting it again after a growing delay
+    if it fails. Every record a list page names is lost if it fails, and
+    there are only a few of them, so they are worth retrying
+    :param r: request
+    :param offset: offset of the page in the list
+    :param url: reference url of the list endpoint
+    :param session:
+    :param semaphore: asyncio.Semaphore capping the concurrent requests
+    :return: the page, or the last failed response
+    """
+    page = await get_pokedex_data_limited(r, offset, url, session, semaphore)
+    for attempt in range(1, CRAWL_PAGE_RETRIES + 1):
+        if 'results' in page:
+            break
+        await asyncio.sleep(attempt)
+        page = await get_pokedex_data_limited(r, offset, url, session, semaphore)
+    return page
+
+
+def prefetch_expanded(r: Request, pokemon):
+    """
+    Starts background fetches of the abilities, moves and stats of a pokemon
+    so that a later expanded lookup of it is served from the cache
+    :param r: request
+    :param pokemon: Pokemon
     :return:
     """
-    try:
-        target_url = url.format(key)
-        response = await session.request(method="GET", url=target_url)
-        json_dict = await response.json()
-        return json_dict
-    except aiohttp.ContentTypeError:
-        return {'error': "error"}
+    for key in pokemon.ability_list():
+        r.fetcher.prefetch(key, f"{API_URL}/ability/{{}}/")
+    for key in pokemon.move_list():
+        r.fetcher.prefetch(key, f"{API_URL}/move/{{}}/")
+    for key in pokemon.stat_list():
+        r.fetcher.prefetch(key, f"{API_URL}/stat/{{}}/")
+
+
+async def download_sprites(r: Request, list_pokemon, store, session, semaphore) -> list:
+    """
+    Downloads every sprite of the pokemon into the store. Urls shared by
+    several pokemon are only downloaded once
+    :param r: request
+    :param list_pokemon: list of Pokemon objects and error strings
+    :param store: SpriteStore
+    :param session:
+    :param semaphore: asyncio.Semaphore capping the concurrent downloads
+    :return: list with a formatted string of the stored sprites of each
+    pokemon, and the error strings in place
+    """
+    sprite_urls = {}
+    for pokemon in list_pokemon:
+        if not isinstance(pokemon, Poke.Pokemon):
+            continue
+        for path, sprite_url in pokemon.sprite_urls.items():
+            if r.sprite_mirror is not None and sprite_url.startswith(SPRITE_URL):
+                sprite_url = r.sprite_mirror + sprite_url[len(SPRITE_URL):]
+            sprite_urls.setdefault(pokemon.name, {})[path] = sprite_url
+
+    unique_urls = list(dict.fromkeys(sprite_url for sprites in sprite_urls.values()
+                                     for sprite_url in sprites.values()))
+    async_coroutines = [SpriteStore.download_limited(store, sprite_url, session, semaphore)
+                        for sprite_url in unique_urls]
+    stored = dict(zip(unique_urls, await asyncio.gather(*async_coroutines)))
+
+    results = []
+    for pokemon in list_pokemon:
+        if not isinstance(pokemon, Poke.Pokemon):
+            results.append(pokemon)
+            continue
+        list_sprite = []
+        for path, sprite_url in sorted(sprite_urls.get(pokemon.name, {}).items()):
+            file_path = stored[sprite_url]
+            if file_path is None:
+                file_path = f"Download failed, will resume next run ({sprite_url})"
+            list_sprite.append(f"{path}: {file_path}")
+        sprites = "\n".join(list_sprite)
+        results.append(f"Name: {pokemon.name}\n"
+                       f"ID: {pokemon.poke_id}\n"
+                       f"\nSprites:\n"
+                       f"------\n"
+                       f"{sprites}\n")
+    return results
 
 
 class BaseHandler(abc.ABC):
@@ -49,14 +176,87 @@ class InputHandler(BaseHandler):
         :param r:
         :return:
         """
-        if r.input_data is None:
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(self.handle_request_async(r))
+        loop.run_until_complete(r.fetcher.drain())
+
+    async def handle_request_async(self, r: Request):
+        """
+        Handle first chain inside a running event loop, so that several
+        requests can share the loop, fetcher and scheduler
+        :param r:
+        :return:
+        """
+        if r.crawl:
+            r.raw_data = []
+        elif r.warm:
+            r.raw_data = r.access_log.hottest(r.mode, r.warm)
+        elif r.input_data is None:
             with open(r.input_file, mode='r') as f:
                 r.raw_data = f.read().splitlines()
         else:
-            r.raw_data = r.input_data
+            r.raw_data = [r.input_data]
         r.number_of_requests = len(r.raw_data)
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(self.next_handler.handle_request(r))
+        if r.fetcher is None:
+            r.fetcher = Fetcher.Fetcher()
+        if r.learnset is None:
+            r.learnset = Learnset.LearnsetIndex()
+        if r.priority is None:
+            if r.crawl or len(r.raw_data) > 1:
+                r.priority = Enums.RequestPriority.BULK
+            else:
+                r.priority = Enums.RequestPriority.INTERACTIVE
+        await self.next_handler.handle_request(r)
+        if r.access_log is not None:
+            r.access_log.save()
+
+
+class FuzzyMatchHandler(BaseHandler):
+    """
+    Handles misspelt keys before any of them are requested from the PokeAPI
+    """
+
+    async def handle_request(self, r: Request):
+        """
+        Matches every key against a trigram index of the names the mode
+        accepts. Ids and known names are passed on, near misses scoring at
+        least r.autocorrect and clearly ahead of the next match are replaced
+        by the best match, and the rest are skipped with a list of suggestions.
+        Skipped and corrected keys keep their position in r.skipped and
+        r.corrections so the output handler can put them back in input order
+        :param r:
+        :return:
+        """
+        url = f"{API_URL}/{NAME_ENDPOINTS[r.mode]}/?limit=100000&offset={{}}"
+        async with aiohttp.ClientSession() as session:
+            names_page = await r.fetcher.fetch(0, url, session, r.priority, r)
+        if 'results' not in names_page:
+            # Without the names there is nothing to match against
+            await self.next_handler.handle_request(r)
+            return
+        index = NameIndex.TrigramIndex(entry['name'] for entry in names_page['results'])
+
+        keys = []
+        for position, key in enumerate(r.raw_data):
+            name = NameIndex.normalize(str(key))
+            if name.isdigit() or name in index:
+                keys.append(name)
+                continue
+            suggestions = index.suggest(name)
+            if suggestions and suggestions[0][1] >= r.autocorrect and (
+                    len(suggestions) == 1
+                    or suggestions[0][1] - suggestions[1][1] >= AUTOCORRECT_MARGIN):
+                r.corrections[position] = f"Corrected '{key}' to '{suggestions[0][0]}'"
+                keys.append(suggestions[0][0])
+            else:
+                message = f"An error occurred. Skipping this request.\nNo match for '{key}'."
+                if suggestions:
+                    string_suggestions = ", ".join(match for match, score in suggestions)
+                    message += f" Did you mean: {string_suggestions}"
+                r.skipped[position] = message
+        r.raw_data = keys
+
+        await self.next_handler.handle_request(r)
 
 
 class PokemonRequestHandler(BaseHandler):
@@ -73,15 +273,18 @@ class PokemonRequestHandler(BaseHandler):
         url = "https://pokeapi.co/api/v2/pokemon/{}/"
         # print(r.raw_data)
         async with aiohttp.ClientSession() as session:
-            async_coroutines = [get_pokedex_data(key, url, session)
+            async_coroutines = [r.fetcher.fetch(key, url, session, r.priority, r)
                                 for key in r.raw_data]
             responses = await asyncio.gather(*async_coroutines)
             for res in responses:
                 try:
-                    r.result.append(Poke.Pokemon(**res))
+                    pokemon = Poke.Pokemon(learnset=r.learnset, **res)
                 except TypeError:
                     r.result.append("An error occurred. Skipping this request.")
-                    pass
+                    continue
+                r.result.append(pokemon)
+                if r.prefetch:
+                    prefetch_expanded(r, pokemon)
 
         self.next_handler.handle_request(r)
 
@@ -99,7 +302,7 @@ class PokemonExpandedHandler(BaseHandler):
         # Get each pokemon
         url = "https://pokeapi.co/api/v2/pokemon/{}/"
         async with aiohttp.ClientSession() as session:
-            async_coroutines = [get_pokedex_data(key, url, session)
+            async_coroutines = [r.fetcher.fetch(key, url, session, r.priority, r)
                                 for key in r.raw_data]
 
             responses = await asyncio.gather(*async_coroutines)
@@ -108,47 +311,62 @@ class PokemonExpandedHandler(BaseHandler):
 
             for res in responses:
                 try:
-                    list_pokemon.append(Poke.Pokemon(**res))
+                    list_pokemon.append(Poke.Pokemon(learnset=r.learnset, **res))
                 except TypeError:
                     list_pokemon.append("An error occurred. Skipping this request.")
                     pass
 
         for pokemon in list_pokemon:
+            if not isinstance(pokemon, Poke.Pokemon):
+                # Failed lookups have nothing to expand
+                continue
             # Get each ability from a pokemon
             url = "https://pokeapi.co/api/v2/ability/{}/"
             async with aiohttp.ClientSession() as session:
-                async_coroutines2 = [get_pokedex_data(key, url, session)
+                async_coroutines2 = [r.fetcher.fetch(key, url, session, r.priority, r)
                                      for key in pokemon.ability_list()]
 
                 responses2 = await asyncio.gather(*async_coroutines2)
                 ability_list = []
-                for ability in responses2:
-                    ability_list.append(Poke.PokemonAbility(**ability))
+                for key, ability in zip(pokemon.ability_list(), responses2):
+                    try:
+                        ability_list.append(Poke.PokemonAbility(**ability))
+                    except TypeError:
+                        ability_list.append(f"Name: {key}\n"
+                                            f"An error occurred. Skipping this request.\n\n")
                 pokemon.abilities = ability_list
             # Get each move from a pokemon
             url = "https://pokeapi.co/api/v2/move/{}/"
             async with aiohttp.ClientSession() as session:
-                async_coroutines3 = [get_pokedex_data(key, url, session)
+                async_coroutines3 = [r.fetcher.fetch(key, url, session, r.priority, r)
                                      for key in pokemon.move_list()]
 
                 responses3 = await asyncio.gather(*async_coroutines3)
                 move_list = []
-                for move in responses3:
-                    move_list.append(Poke.PokemonMove(**move))
+                for key, move in zip(pokemon.move_list(), responses3):
+                    try:
+                        move_list.append(Poke.PokemonMove(**move))
+                    except TypeError:
+                        move_list.append(f"Name: {key}\n"
+                                         f"An error occurred. Skipping this request.\n\n")
                 pokemon.moves = move_list
             # Get each stat from a pokemon
             url = "https://pokeapi.co/api/v2/stat/{}/"
             async with aiohttp.ClientSession() as session:
-                async_coroutines4 = [get_pokedex_data(key, url, session)
+                async_coroutines4 = [r.fetcher.fetch(key, url, session, r.priority, r)
                                      for key in pokemon.stat_list()]
 
                 responses4 = await asyncio.gather(*async_coroutines4)
                 stat_list = []
-                for stat in responses4:
-                    stat_list.append(Poke.PokemonStat(**stat))
+                for key, stat in zip(pokemon.stat_list(), responses4):
+                    try:
+                        stat_list.append(Poke.PokemonStat(**stat))
+                    except TypeError:
+                        stat_list.append(f"Name: {key}\n"
+                                         f"An error occurred. Skipping this request.\n\n")
                 pokemon.stats = stat_list
 
-        r.result = list_pokemon
+        r.result.extend(list_pokemon)
 
         self.next_handler.handle_request(r)
 
@@ -166,7 +384,7 @@ class AbilityRequestHandler(BaseHandler):
         """
         url = "https://pokeapi.co/api/v2/ability/{}/"
         async with aiohttp.ClientSession() as session:
-            async_coroutines = [get_pokedex_data(key, url, session)
+            async_coroutines = [r.fetcher.fetch(key, url, session, r.priority, r)
                                 for key in r.raw_data]
             responses = await asyncio.gather(*async_coroutines)
             for res in responses:
@@ -193,7 +411,7 @@ class MoveRequestHandler(BaseHandler):
 
         url = "https://pokeapi.co/api/v2/move/{}/"
         async with aiohttp.ClientSession() as session:
-            async_coroutines = [get_pokedex_data(key, url, session)
+            async_coroutines = [r.fetcher.fetch(key, url, session, r.priority, r)
                                 for key in r.raw_data]
             responses = await asyncio.gather(*async_coroutines)
             for res in responses:
@@ -206,24 +424,293 @@ class MoveRequestHandler(BaseHandler):
         self.next_handler.handle_request(r)
 
 
+class StatRequestHandler(BaseHandler):
+    """
+    Handle stat requests
+    """
+
+    async def handle_request(self, r: Request):
+        """
+        Create PokeStat objects
+        :param r:
+        :return:
+        """
+        url = "https://pokeapi.co/api/v2/stat/{}/"
+        async with aiohttp.ClientSession() as session:
+            async_coroutines = [r.fetcher.fetch(key, url, session, r.priority, r)
+                                for key in r.raw_data]
+            responses = await asyncio.gather(*async_coroutines)
+            for res in responses:
+                try:
+                    r.result.append(Poke.PokemonStat(**res))
+                except TypeError:
+                    r.result.append("An error occurred. Skipping this request.")
+                    pass
+
+        self.next_handler.handle_request(r)
+
+
+class EvolutionRequestHandler(BaseHandler):
+    """
+    Handle evolution requests
+    """
+
+    async def handle_request(self, r: Request):
+        """
+        Creates an EvolutionChain object for each key. Keys whose family is
+        already known from the cache skip the species request. The species of
+        the other distinct keys are fetched concurrently, then every distinct
+        evolution chain they point to, so a family is only fetched once
+        :param r:
+        :return:
+        """
+        species_url = f"{API_URL}/pokemon-species/{{}}/"
+        chain_url = f"{API_URL}/evolution-chain/{{}}/"
+        keys = [str(key).strip().lower() for key in r.raw_data]
+        unique_keys = list(dict.fromkeys(keys))
+        cache = r.fetcher.cache
+
+        key_chains = {}
+        if cache is not None:
+            for key in unique_keys:
+                family = cache.get(FAMILY_KEY.format(key))
+                if family is not None:
+                    key_chains[key] = family[0]['chain']
+        unknown_keys = [key for key in unique_keys if key not in key_chains]
+
+        async with aiohttp.ClientSession() as session:
+            async_coroutines = [r.fetcher.fetch(key, species_url, session, r.priority, r)
+                                for key in unknown_keys]
+            responses = await asyncio.gather(*async_coroutines)
+            for key, species in zip(unknown_keys, responses):
+                if 'evolution_chain' in species:
+                    key_chains[key] = species['evolution_chain']['url'].rstrip('/').split('/')[-1]
+
+            chain_ids = list(dict.fromkeys(key_chains.values()))
+            async_coroutines = [r.fetcher.fetch(chain_id, chain_url, session, r.priority, r)
+                                for chain_id in chain_ids]
+            responses = await asyncio.gather(*async_coroutines)
+            chains = {}
+            for chain_id, res in zip(chain_ids, responses):
+                try:
+                    chains[chain_id] = Poke.EvolutionChain(**res)
+                except TypeError:
+                    continue
+                if cache is not None:
+                    # Every member resolves to this chain from now on
+                    for member in chains[chain_id].members + chains[chain_id].member_ids:
+                        cache.put(FAMILY_KEY.format(member), {'chain': chain_id})
+
+        for key in keys:
+            chain = chains.get(key_chains.get(key))
+            if chain is None:
+                r.result.append("An error occurred. Skipping this request.")
+            else:
+                r.result.append(chain)
+
+        self.next_handler.handle_request(r)
+
+
+class SpriteRequestHandler(BaseHandler):
+    """
+    Handle sprite requests
+    """
+
+    async def handle_request(self, r: Request):
+        """
+        Downloads every sprite of the requested pokemon into the sprite store,
+        at most r.concurrency at once
+        :param r:
+        :return:
+        """
+        url = f"{API_URL}/pokemon/{{}}/"
+        store = SpriteStore.SpriteStore(r.sprite_dir)
+        semaphore = asyncio.Semaphore(r.concurrency)
+        async with aiohttp.ClientSession() as session:
+            async_coroutines = [r.fetcher.fetch(key, url, session, r.priority, r)
+                                for key in r.raw_data]
+            responses = await asyncio.gather(*async_coroutines)
+            list_pokemon = []
+            for res in responses:
+                try:
+                    list_pokemon.append(Poke.Pokemon(learnset=r.learnset, **res))
+                except TypeError:
+                    list_pokemon.append("An error occurred. Skipping this request.")
+            r.result.extend(await download_sprites(r, list_pokemon, store, session, semaphore))
+
+        self.next_handler.handle_request(r)
+
+
+class CrawlHandler(BaseHandler):
+    """
+    Handles crawl requests by walking the paginated list endpoint of the
+    selected mode and fetching every record it names
+    """
+
+    async def handle_request(self, r: Request):
+        """
+        Fetches the list pages and the detail records concurrently, capped at
+        r.concurrency requests in flight. Records are passed on to the next
+        handler one page at a time, in list order, as soon as each page is done.
+        Detail records are only fetched CRAWL_PAGES_AHEAD pages ahead of the
+        page being passed on, so memory stays bounded however large the crawl.
+        In sprite mode the sprites of each page are downloaded before it is
+        passed on. A list page that still fails after CRAWL_PAGE_RETRIES
+        retries leaves an error in place of each record it lists
+        :param r:
+        :return:
+        """
+        endpoint, pokedex_class = CRAWL_ENDPOINTS[r.mode]
+        # Every crawled pokemon is added to the learnset index of the request
+        shared = {'learnset': r.learnset} if pokedex_class is Poke.Pokemon else {}
+        list_url = f"{API_URL}/{endpoint}/?limit={CRAWL_PAGE_SIZE}&offset={{}}"
+        detail_url = f"{API_URL}/{endpoint}/{{}}/"
+        semaphore = asyncio.Semaphore(r.concurrency)
+        store = None
+        if r.mode == Enums.PokedexMode.SPRITE:
+            store = SpriteStore.SpriteStore(r.sprite_dir)
+
+        async with aiohttp.ClientSession() as session:
+            first_page = await get_list_page(r, 0, list_url, session, semaphore)
+            if 'count' not in first_page:
+                r.result = ["An error occurred. Skipping this request."]
+                self.next_handler.handle_request(r)
+                return
+            r.number_of_requests = first_page['count']
+
+            offsets = range(0, first_page['count'], CRAWL_PAGE_SIZE)
+            page_coroutines = [get_list_page(r, offset, list_url, session, semaphore)
+                               for offset in offsets[1:]]
+            pages = [first_page] + await asyncio.gather(*page_coroutines)
+
+            page_names = []
+            for offset, page in zip(offsets, pages):
+                if 'results' not in page:
+                    # Keep a place for every record of the page that failed
+                    missing = min(CRAWL_PAGE_SIZE, first_page['count'] - offset)
+                    page_names.append([None] * missing)
+                    continue
+                # Evolution chains are unnamed, so they are fetched by id
+                names = [entry.get('name', entry['url'].rstrip('/').split('/')[-1])
+                         for entry in page['results']]
+                r.raw_data.extend(names)
+                page_names.append(names)
+
+            def fetch_page(names):
+                return [asyncio.ensure_future(
+                    get_pokedex_data_limited(r, name, detail_url, session, semaphore))
+                    if name is not None else None
+                    for name in names]
+
+            # Keep the next pages fetching so the semaphore stays saturated
+            # while the current page is being written out
+            upcoming = iter(page_names)
+            page_tasks = collections.deque(fetch_page(names) for names in
+                                           itertools.islice(upcoming, CRAWL_PAGES_AHEAD))
+            while page_tasks:
+                tasks = page_tasks.popleft()
+                next_names = next(upcoming, None)
+                if next_names is not None:
+                    page_tasks.append(fetch_page(next_names))
+                r.result = []
+                for task in tasks:
+                    if task is None:
+                        r.result.append("An error occurred. Skipping this request.")
+                        continue
+                    try:
+                        r.result.append(pokedex_class(**await task, **shared))
+                    except TypeError:
+                        r.result.append("An error occurred. Skipping this request.")
+                if store is not None:
+                    r.result = await download_sprites(r, r.result, store, session, semaphore)
+                self.next_handler.handle_request(r)
+
+
+class LearnsetHandler(BaseHandler):
+    """
+    Handles learnset queries on the pokemon of a request
+    """
+    def handle_request(self, r: Request):
+        """
+        Answers the learnset query from the learnset index shared by the
+        pokemon of the request. With r.learns only the pokemon that learn
+        the move are passed on, otherwise each pokemon is replaced by the
+        moves it learns in r.version_group. Errors are passed on in place.
+        May be called several times for one request (e.g. when crawling)
+        :param r:
+        :return:
+        """
+        learners = set()
+        if r.learns is not None:
+            learners.update(r.learnset.pokemon_learning(r.learns, r.version_group))
+        results = []
+        for response in r.result:
+            if not isinstance(response, Poke.Pokemon):
+                results.append(response)
+            elif r.learns is not None:
+                if response.name in learners:
+                    results.append(f"Name: {response.name}\n"
+                                   f"ID: {response.poke_id}\n"
+                                   f"Learns: {r.learns}\n")
+            else:
+                list_move = []
+                for name, method, level in response.moves_learned(r.version_group, r.max_level,
+                                                                  r.learn_method):
+                    list_move.append(f"Move name: {name}, Learn method: {method}, "
+                                     f"Level acquired: {level}")
+                moves = "\n".join(list_move)
+                results.append(f"Name: {response.name}\n"
+                               f"ID: {response.poke_id}\n"
+                               f"Version group: {r.version_group}\n"
+                               f"\nMoves:\n"
+                               f"------\n"
+                               f"{moves}\n")
+        r.result = results
+        self.next_handler.handle_request(r)
+
+
 class OutputHandler(BaseHandler):
     """
     Handles the output of the PokeDex
     """
     def handle_request(self, r: Request):
         """
-        Prints out the result to console or saves them to a specified .txt file
+        Prints out the result to console or saves them to a specified .txt file.
+        May be called several times for one request (e.g. when crawling), in
+        which case later results are appended to the file
         :param r:
         :return:
         """
+        if r.access_log is not None and not r.crawl and not r.warm:
+            # Keys are counted as they were requested, since the cache is keyed
+            # by the requested url and warming has to refresh those same urls
+            r.access_log.record(r.mode, r.raw_data)
+        if r.skipped or r.corrections:
+            # Put the keys skipped before fetching back at their input positions,
+            # and note the corrected keys above their results
+            results = iter(r.result)
+            merged = []
+            for position in range(len(r.skipped) + len(r.result)):
+                if position in r.skipped:
+                    merged.append(r.skipped[position])
+                elif position in r.corrections:
+                    merged.append(f"{r.corrections[position]}\n{next(results)}")
+                else:
+                    merged.append(next(results))
+            r.result = merged
+            r.skipped = {}
+            r.corrections = {}
         if r.output == 'print':
             for response in r.result:
                 print(response, "\n")
         else:
-            with open(r.output, mode='w') as my_text_file:
-                date = datetime.datetime.now()
-                string_date = date.strftime("%d/%m/%Y %H:%M")
-                my_text_file.write(f"Timestamp: {string_date}\n"
-                                   f"Number of requests: {r.number_of_requests}\n")
+            file_mode = 'a' if r.output_started else 'w'
+            with open(r.output, mode=file_mode) as my_text_file:
+                if not r.output_started:
+                    date = datetime.datetime.now()
+                    string_date = date.strftime("%d/%m/%Y %H:%M")
+                    my_text_file.write(f"Timestamp: {string_date}\n"
+                                       f"Number of requests: {r.number_of_requests}\n")
                 for response in r.result:
                     my_text_file.write(f"{response}\n")
+        r.output_started = True
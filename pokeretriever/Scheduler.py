@@ -0,0 +1,154 @@
+import asyncio
+import collections
+import pokeretriever.Enums as Enums
+"""
+This module contains the scheduler that shares the PokeAPI connection between requests
+"""
+
+
+class RequestScheduler:
+    """
+    Limits the PokeAPI requests in flight across every pokedex request.
+    Waiting requests are served by priority, and requests of the same
+    priority take turns so that one large batch cannot starve the others
+    """
+
+    def __init__(self, max_in_flight=50, interactive_reserve=None):
+        """
+        Constructor
+        :param max_in_flight: maximum number of PokeAPI requests in flight
+        :param interactive_reserve: slots that bulk requests may never use, so
+        interactive requests always find one free quickly. Defaults to a fifth
+        of max_in_flight
+        """
+        if interactive_reserve is None:
+            interactive_reserve = max(1, max_in_flight // 5)
+        self._max_in_flight = max_in_flight
+        self._bulk_limit = max(1, max_in_flight - interactive_reserve)
+        self._in_flight = 0
+        self._bulk_in_flight = 0
+        # One queue per priority, each holding a queue of waiters per owner
+        self._waiting = {priority: collections.OrderedDict() for priority in Enums.RequestPriority}
+
+    @property
+    def in_flight(self):
+        """
+        Number of PokeAPI requests in flight
+        :return: int
+        """
+        return self._in_flight
+
+    def _has_room(self, priority) -> bool:
+        """
+        True if a request of the priority may start now
+        :param priority: RequestPriority
+        :return: bool
+        """
+        if self._in_flight >= self._max_in_flight:
+            return False
+        return priority != Enums.RequestPriority.BULK or self._bulk_in_flight < self._bulk_limit
+
+    def _start(self, priority):
+        """
+        Counts a request as in flight
+        :param priority: RequestPriority
+        :return:
+        """
+        self._in_flight += 1
+        if priority == Enums.RequestPriority.BULK:
+            self._bulk_in_flight += 1
+
+    async def acquire(self, priority, owner):
+        """
+        Waits for a slot to send a PokeAPI request in
+        :param priority: RequestPriority
+        :param owner: the pokedex request the PokeAPI request belongs to
+        :return:
+        """
+        if self._has_room(priority) and not any(self._waiting[p] for p in Enums.RequestPriority
+                                                if p <= priority):
+            self._start(priority)
+            return
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiting[priority].setdefault(owner, collections.deque()).append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the cancellation
+                self.release(priority)
+            else:
+                self._remove(priority, owner, waiter)
+            raise
+
+    def release(self, priority):
+        """
+        Frees the slot of a finished PokeAPI request and hands slots to waiters
+        :param priority: RequestPriority the request was sent with
+        :return:
+        """
+        self._in_flight -= 1
+        if priority == Enums.RequestPriority.BULK:
+            self._bulk_in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        """
+        Starts as many waiters as there is room for, highest priority first and
+        taking turns between owners
+        :return:
+        """
+        for priority in Enums.RequestPriority:
+            owners = self._waiting[priority]
+            while owners and self._has_room(priority):
+                owner, waiters = owners.popitem(last=False)
+                waiter = waiters.popleft()
+                if waiters:
+                    owners[owner] = waiters
+                self._start(priority)
+                waiter.set_result(None)
+            if owners:
+                # Lower priorities wait until this one is drained
+                return
+
+    def _remove(self, priority, owner, waiter):
+        """
+        Removes a cancelled waiter
+        :return:
+        """
+        waiters = self._waiting[priority].get(owner)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+        except ValueError:
+            pass
+        if not waiters:
+            del self._waiting[priority][owner]
+        self._wake()
+
+    def slot(self, priority, owner):
+        """
+        Gets a context manager holding a slot for the duration of a PokeAPI request
+        :param priority: RequestPriority
+        :param owner: the pokedex request the PokeAPI request belongs to
+        :return: async context manager
+        """
+        return _Slot(self, priority, owner)
+
+
+class _Slot:
+    """
+    Async context manager returned by RequestScheduler.slot
+    """
+
+    def __init__(self, scheduler, priority, owner):
+        self._scheduler = scheduler
+        self._priority = priority
+        self._owner = owner
+
+    async def __aenter__(self):
+        await self._scheduler.acquire(self._priority, self._owner)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._scheduler.release(self._priority)
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import json
+import os
+import aiohttp
+"""
+This module contains the content addressed store that sprites are downloaded into
+"""
+
+CHUNK_SIZE = 64 * 1024
+
+
+class SpriteStore:
+    """
+    Stores downloaded files under the sha256 of their content, so a file that
+    is served from several urls is only kept once. Downloads are written to a
+    partial file first and resumed from where they stopped if interrupted.
+    Each finished download is appended to the url index straight away, so a
+    run that is killed never has to download a stored file again
+    """
+
+    def __init__(self, directory):
+        """
+        Constructor
+        :param directory: path of the store directory, created if missing
+        """
+        self._directory = directory
+        self._index_path = os.path.join(directory, "index.jsonl")
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "partial"), exist_ok=True)
+        # Maps each url to its file, relative to the store directory
+        self._index = {}
+        try:
+            with open(self._index_path, mode='r') as f:
+                lines = f.read()
+        except OSError:
+            lines = ""
+        for line in lines.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut short by a killed run
+                continue
+            self._index[entry['url']] = entry['path']
+        if lines and not lines.endswith("\n"):
+            # Keep the next entry off the line that was cut short
+            with open(self._index_path, mode='a') as f:
+                f.write("\n")
+
+    def _object_path(self, digest, extension):
+        """
+        Gets the path a file is stored at, relative to the store directory
+        :param digest: sha256 hex digest of the content
+        :param extension: file extension including the dot
+        :return: string
+        """
+        return os.path.join("objects", digest[:2], f"{digest}{extension}")
+
+    def _partial_path(self, url):
+        """
+        Gets the path a download of the url is written to until it is complete
+        :param url: string
+        :return: string
+        """
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self._directory, "partial", f"{digest}.part")
+
+    def get(self, url):
+        """
+        Gets the stored file of a url
+        :param url: string
+        :return: path, or None if the url has not been downloaded
+        """
+        path = self._index.get(url)
+        if path is None:
+            return None
+        path = os.path.join(self._directory, path)
+        return path if os.path.exists(path) else None
+
+    async def download(self, url, session):
+        """
+        Downloads the url into the store in chunks, unless it is stored already.
+        A partial download left by an earlier run is resumed with a range request
+        :param url: string
+        :param session:
+        :return: path of the stored file
+        """
+        path = self.get(url)
+        if path is not None:
+            return path
+
+        partial_path = self._partial_path(url)
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        headers = {'Range': f"bytes={offset}-"} if offset else {}
+        async with session.request(method="GET", url=url, headers=headers) as response:
+            if response.status == 416:
+                # The partial file already holds the whole content
+                pass
+            else:
+                response.raise_for_status()
+                file_mode = 'ab' if response.status == 206 else 'wb'
+                with open(partial_path, mode=file_mode) as f:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        f.write(chunk)
+
+        sha256 = hashlib.sha256()
+        with open(partial_path, mode='rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha256.update(chunk)
+        relative_path = self._object_path(sha256.hexdigest(), os.path.splitext(url)[1])
+        path = os.path.join(self._directory, relative_path)
+        if os.path.exists(path):
+            os.remove(partial_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(partial_path, path)
+        self._index[url] = relative_path
+        with open(self._index_path, mode='a') as f:
+            f.write(json.dumps({'url': url, 'path': relative_path}) + "\n")
+        return path
+
+
+async def download_limited(store, url, session, semaphore):
+    """
+    Downloads a url into the store, waiting on the semaphore so that only a
+    limited number of downloads are in flight at once
+    :param store: SpriteStore
+    :param url: string
+    :param session:
+    :param semaphore: asyncio.Semaphore capping the concurrent downloads
+    :return: path of the stored file, or None if the download failed
+    """
+    async with semaphore:
+        try:
+            return await store.download(url, session)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None